@@ -1,11 +1,23 @@
-import time
+import asyncio
+import csv
+import functools
+import hashlib
 import json
 import logging
 import os
-import requests
-from bs4 import BeautifulSoup
-import pandas as pd
-from openai import OpenAI
+import re
+import tempfile
+import time
+from pathlib import Path
+import aiohttp
+from aiolimiter import AsyncLimiter
+from lxml import etree, html as lxhtml
+from selectolax.lexbor import LexborHTMLParser
+
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib json module
+    orjson = None
 
 # Configure logging
 logging.basicConfig(
@@ -14,6 +26,48 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# -------------------------
+# Helper: fast JSON (orjson when installed)
+# -------------------------
+def json_loads(data):
+    """Parse JSON from str or bytes."""
+    return orjson.loads(data) if orjson else json.loads(data)
+
+def json_dumps(obj, sort_keys=False):
+    """Serialize `obj` to JSON bytes."""
+    if orjson:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+    return json.dumps(obj, sort_keys=sort_keys).encode()
+
+def read_cache_file(path):
+    """Return the JSON value cached at `path`, or None if missing or unreadable."""
+    try:
+        return json_loads(path.read_bytes())
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        # a truncated/corrupt entry is just a cache miss; it gets overwritten
+        logger.warning(f"Ignoring unreadable cache file {path}: {e}")
+        return None
+
+def write_cache_file(path, value):
+    """
+    Write `value` as JSON to `path` atomically (temp file + os.replace), so a
+    crash mid-write never leaves a half-written cache entry behind.
+    """
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(json_dumps(value))
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    except OSError as e:
+        logger.warning(f"Could not write cache file {path}: {e}")
+
 # -------------------------
 # Configuration Management
 # -------------------------
@@ -52,41 +106,201 @@ API_KEY, API_BASE, MODEL_NAME = load_config()
 logger.info(f"Using API endpoint: {API_BASE}")
 logger.info(f"Using model: {MODEL_NAME}")
 
-# Initialize OpenAI-compatible client
-client = OpenAI(api_key=API_KEY, base_url=API_BASE)
+# The OpenAI-compatible client and tokenizer are created lazily on first use
+# (see get_llm_client / get_token_encoding) to keep startup fast
+MAX_PROJECT_TOKENS = 3000  # per project text blob, measured with get_token_encoding()
+CHARS_PER_TOKEN = 4  # rough English average, used if the tokenizer is unavailable
+
+# Number of projects sent to the LLM per extraction request
+EXTRACTION_BATCH_SIZE = 5
+EXTRACTION_TOKENS_PER_PROJECT = 400  # output budget per extracted JSON object
+MAX_OUTPUT_TOKENS = 4096  # output cap of many OpenAI-compatible models
+BATCH_WAIT = 1.0  # seconds to wait for a partial batch to fill before sending it
+BATCH_POLL_INTERVAL = 0.05  # seconds between checks while a partial batch fills
+MAX_CONCURRENT_LLM_CALLS = 8
+
+# Output CSV, written one row per extracted project and appended to across
+# runs; URLs already in it are skipped
+OUTPUT_CSV = "phd_listings.csv"
+CSV_FIELDS = [
+    "title", "university", "supervisor", "funding", "international_eligible",
+    "alignment_score", "subject_area", "key_skills", "url",
+]
+
+# LLM response and search-page link caches (safe to delete at any time)
+LLM_CACHE_DIR = Path(".llm_cache")
+LINK_CACHE_DIR = Path(".link_cache")
+LINK_CACHE_TTL = 3600  # seconds; search results change slowly
+
+# Scraper settings
+MAX_CONCURRENT_REQUESTS = 5  # fetch workers, i.e. project pages fetched in parallel
+URL_QUEUE_SIZE = 100  # project URLs buffered between search and fetch stages
+MAX_CONNECTIONS = 20  # total pooled keep-alive connections
+MAX_CONNECTIONS_PER_HOST = 4
+REQUEST_TIMEOUT = 10  # seconds
+REQUESTS_PER_SECOND = 4  # polite rate cap shared by all concurrent fetches
+MAX_RETRIES = 2
+RETRY_BACKOFF = 0.5  # seconds, doubled on each retry
+RETRY_STATUSES = {429, 502, 503, 504}
+
+# Real FindAPhD project pages look like /phds/project/<slug>/?p123456; other
+# /phds/ links are search filters and listings that aren't worth fetching
+PROJECT_RE = re.compile(r"/phds/project/[^?]+\?p\d+")
 
 # -------------------------
-# Helper: Get realistic browser headers
+# Helper: realistic browser headers and shared HTTP session
 # -------------------------
-def get_headers():
-    """Return realistic browser headers to avoid 403 blocks."""
-    return {
-        "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate",
-        "DNT": "1",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-        "Sec-Fetch-Dest": "document",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "none",
-        "Cache-Control": "max-age=0"
-    }
+# Realistic browser headers to avoid 403 blocks
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate, br",
+    "DNT": "1",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+    "Cache-Control": "max-age=0"
+}
+
+# Token bucket shared by every request (retries included), so concurrency
+# doesn't translate into hammering the site
+LIMITER = AsyncLimiter(max_rate=REQUESTS_PER_SECOND, time_period=1.0)
+
+def create_session():
+    """
+    Create the shared HTTP session used for the whole run.
+    
+    Connections to findaphd.com are pooled and kept alive, so only the
+    first request per connection pays for the TCP + TLS handshake.
+    """
+    connector = aiohttp.TCPConnector(limit=MAX_CONNECTIONS, limit_per_host=MAX_CONNECTIONS_PER_HOST)
+    return aiohttp.ClientSession(
+        connector=connector,
+        headers=HEADERS,
+        timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+    )
+
+async def fetch_html(session, url):
+    """
+    Fetch a page's HTML, retrying transient errors (429/5xx, dropped connections,
+    timeouts) with exponential backoff.
+    """
+    for attempt in range(MAX_RETRIES + 1):
+        last_attempt = attempt == MAX_RETRIES
+        try:
+            async with LIMITER, session.get(url) as response:
+                if response.status not in RETRY_STATUSES or last_attempt:
+                    response.raise_for_status()
+                    # like requests' .text, never fail on bytes that don't match the charset
+                    return await response.text(errors="replace")
+                reason = f"HTTP {response.status}"
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+            # e.g. a pooled keep-alive connection closed by the server
+            if last_attempt:
+                raise
+            reason = f"{type(e).__name__} {e}".strip()
+        
+        delay = RETRY_BACKOFF * 2 ** attempt
+        logger.warning(f"Got {reason} from {url}, retrying in {delay}s")
+        await asyncio.sleep(delay)
+
+# -------------------------
+# Helper: cached LLM calls
+# -------------------------
+@functools.cache
+def get_llm_client():
+    """Return the shared OpenAI-compatible async client, importing openai on first use."""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=API_KEY, base_url=API_BASE)
+
+@functools.cache
+def get_token_encoding():
+    """
+    Return the tokenizer used to cap project text length (non-OpenAI models
+    fall back to cl100k_base), or None if it can't be loaded.
+    """
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(MODEL_NAME)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        # first use downloads the BPE file, which fails offline or behind a proxy
+        logger.warning(f"Could not load tiktoken encoding, truncating by characters instead: {e}")
+        return None
+
+def is_complete_json(text):
+    """Cheap check that a streamed JSON reply wasn't cut off, before paying for json_loads."""
+    return text.rstrip().endswith(("}", "]"))
+
+def llm_cache_path(payload):
+    """Return the .llm_cache file for a JSON-serializable request description."""
+    key = hashlib.sha256(json_dumps(payload, sort_keys=True)).hexdigest()
+    return LLM_CACHE_DIR / key[:2] / key
+
+async def chat(messages, model=MODEL_NAME, max_tokens=1024, response_format=None):
+    """
+    Return the LLM reply text for `messages` (uncached).
+    """
+    extra = {"response_format": response_format} if response_format else {}
+    stream = await get_llm_client().chat.completions.create(
+        model=model,
+        max_tokens=max_tokens,
+        messages=messages,
+        stream=True,
+        **extra
+    )
+    
+    # Stream the reply so a cancelled caller stops generation mid-way;
+    # collect pieces in a list and join once (no quadratic `+=`)
+    chunks = []
+    try:
+        async for event in stream:
+            if event.choices and event.choices[0].delta.content:
+                chunks.append(event.choices[0].delta.content)
+    finally:
+        await stream.close()
+    return "".join(chunks)
+
+async def cached_chat(messages, model=MODEL_NAME, max_tokens=1024, response_format=None):
+    """
+    Return the LLM reply for `messages`, reusing an on-disk copy when the
+    exact same request (model, max_tokens, response_format, messages) was
+    made before.
+    """
+    path = llm_cache_path({"m": model, "t": max_tokens, "f": response_format, "msgs": messages})
+    
+    cached = read_cache_file(path)
+    if isinstance(cached, str):
+        logger.debug(f"LLM cache hit: {path.name}")
+        return cached
+    
+    response_text = await chat(messages, model, max_tokens, response_format)
+    
+    if response_format and not is_complete_json(response_text):
+        # likely hit max_tokens; don't cache a truncated reply
+        logger.warning(f"LLM returned incomplete JSON ({len(response_text)} chars), not caching")
+        return response_text
+    
+    write_cache_file(path, response_text)
+    return response_text
 
 # -------------------------
 # 1. LLM: generate search queries
 # -------------------------
-def generate_search_queries(user_prompt):
+async def generate_search_queries(user_prompt):
     """
     Input: high-level user prompt
     Output: list of search query URLs (strings)
     """
     logger.info(f"Generating search queries for: {user_prompt}")
     
-    message = client.chat.completions.create(
-        model=MODEL_NAME,
-        max_tokens=1024,
+    response_text = await cached_chat(
+        response_format={"type": "json_object"},
         messages=[
             {
                 "role": "user",
@@ -96,20 +310,19 @@ def generate_search_queries(user_prompt):
                 
                 User request: {user_prompt}
                 
-                Return ONLY a JSON list of URLs (strings) in this format:
-                [
+                Return ONLY a JSON object with a list of URLs (strings) in this format:
+                {{"queries": [
                 "https://www.findaphd.com/phds/united-kingdom/?g0w900&Keywords=llm+optimisation",
                 "https://www.findaphd.com/phds/united-kingdom/?g0w900&Keywords=machine+learning"
-                ]
+                ]}}
 
                 Make sure URLs are properly formatted with URL encoding for spaces (+) and special characters."""
             }
         ]
     )
     
-    response_text = message.choices[0].message.content
     print(response_text)
-    queries = json.loads(response_text.removeprefix("```json").removesuffix("```"))
+    queries = json_loads(response_text)["queries"]
     logger.debug(f"LLM response for queries: {response_text}")
     
     # Parse the JSON response
@@ -119,128 +332,242 @@ def generate_search_queries(user_prompt):
 # -------------------------
 # 2. Scraper: get project links from search results
 # -------------------------
-def get_project_links(search_url):
+def _parse_links(html):
+    """
+    Extract project links from a search results page (CPU-bound, run in a thread).
+    """
+    if not html.strip():
+        return []
+    doc = lxhtml.fromstring(html)
+    
+    # extract <a> hrefs pointing to project pages
+    seen = set()
+    links = []
+    for href in doc.xpath('//a[contains(@href, "/phds/")]/@href'):
+        if not PROJECT_RE.search(href):
+            continue
+        href = str(href)  # plain str, so results don't keep the parsed tree alive
+        full_url = href if href.startswith('http') else "https://www.findaphd.com" + href
+        if full_url in seen:  # avoid duplicates
+            continue
+        seen.add(full_url)
+        links.append(full_url)
+    return links
+
+async def get_project_links(session, search_url):
     """
     Fetch search results page and extract all project links.
+    
+    Results are cached on disk per search URL for LINK_CACHE_TTL seconds.
     """
+    cache_path = LINK_CACHE_DIR / hashlib.sha256(search_url.encode()).hexdigest()
+    try:
+        fresh = time.time() - cache_path.stat().st_mtime < LINK_CACHE_TTL
+    except OSError:
+        fresh = False
+    links = read_cache_file(cache_path) if fresh else None
+    if isinstance(links, list) and links:
+        logger.info(f"Found {len(links)} project links (cached) for: {search_url}")
+        return links
+    
     logger.info(f"Fetching project links from: {search_url}")
     
     try:
-        response = requests.get(search_url, headers=get_headers(), timeout=10)
-        response.raise_for_status()
-        time.sleep(3)  # increased polite delay
+        html = await fetch_html(session, search_url)
         
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # extract <a> tags pointing to project pages
-        links = []
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            if "/phds/" in href:  # crude filter for MVP
-                full_url = href if href.startswith('http') else "https://www.findaphd.com" + href
-                if full_url not in links:  # avoid duplicates
-                    links.append(full_url)
+        # parse off the event loop so other fetches keep progressing
+        links = await asyncio.to_thread(_parse_links, html)
         
         logger.info(f"Found {len(links)} project links")
+        if links:  # an empty page is often a bot/consent wall; retry it next run
+            write_cache_file(cache_path, links)
         return links
     
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"Error fetching {search_url}: {e}")
         return []
+    except (etree.ParserError, ValueError) as e:
+        logger.error(f"Error parsing {search_url}: {e}")
+        return []
 
 # -------------------------
 # 3. Scraper: get clean text from project page
 # -------------------------
-def get_clean_text(project_url):
+def _parse_clean_text(html):
+    """
+    Extract clean, visible text from a project page (CPU-bound, run in a thread).
+    """
+    tree = LexborHTMLParser(html)
+    
+    # remove noise
+    for node in tree.css('script, style, nav, footer, header'):
+        node.decompose()
+    
+    # extract visible text from meaningful tags
+    text_elements = []
+    for node in tree.css('p, h1, h2, h3, h4, li'):
+        text = node.text(strip=True)
+        if text and len(text) > 10:  # filter out very short snippets
+            text_elements.append(text)
+    
+    logger.info(f"Extracted {len(text_elements)} text elements")
+    return "\n".join(text_elements)
+
+async def get_clean_text(session, project_url):
     """
     Fetch project page and extract clean, visible text.
     """
     logger.info(f"Extracting text from: {project_url}")
     
     try:
-        response = requests.get(project_url, headers=get_headers(), timeout=10)
-        response.raise_for_status()
-        time.sleep(3)  # increased polite delay
-        
-        soup = BeautifulSoup(response.text, "html.parser")
-        
-        # remove noise
-        for tag in soup(['script', 'style', 'nav', 'footer', 'header']):
-            tag.decompose()
-        
-        # extract visible text from meaningful tags
-        text_elements = []
-        for tag in soup.find_all(['p', 'h1', 'h2', 'h3', 'h4', 'li']):
-            text = tag.get_text(strip=True)
-            if text and len(text) > 10:  # filter out very short snippets
-                text_elements.append(text)
+        html = await fetch_html(session, project_url)
         
-        clean_text = "\n".join(text_elements)
-        logger.info(f"Extracted {len(text_elements)} text elements")
-        return clean_text
+        # parse off the event loop so other fetches keep progressing
+        return await asyncio.to_thread(_parse_clean_text, html)
     
-    except requests.RequestException as e:
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
         logger.error(f"Error fetching {project_url}: {e}")
         return ""
+    except ValueError as e:
+        logger.error(f"Error parsing {project_url}: {e}")
+        return ""
 
 # -------------------------
 # 4. LLM: extract structured data
 # -------------------------
-def extract_project_info(text_blob, project_url):
+EXTRACTION_FIELDS = """{
+  "project_index": index N from the "=== PROJECT N ===" header,
+  "title": "Project title",
+  "university": "University name",
+  "supervisor": "Supervisor name(s)",
+  "funding": "Funding information or null if not mentioned",
+  "international_eligible": "true/false/null - is international funding available?",
+  "alignment_score": 0-10 (how aligned with AI/ML/data science based on the text),
+  "subject_area": "Main subject area (e.g., Machine Learning, NLP, CV)",
+  "key_skills": "Key skills mentioned or required"
+}"""
+
+async def extract_project_info_batch(items):
     """
-    Input: clean text blob from project page
-    Output: structured dict with fields like:
-        title, university, supervisor, funding, alignment
+    Input: list of (project_url, text_blob) tuples
+    Output: list of structured dicts (or None on failure), aligned with `items`,
+        with fields like title, university, supervisor, funding, alignment
+    
+    Up to EXTRACTION_BATCH_SIZE projects are sent in a single LLM request to
+    amortize per-call latency. Results are cached per project (not per batch),
+    since which projects end up batched together depends on fetch timing.
     """
-    logger.info(f"Extracting structured info from project")
+    logger.info(f"Extracting structured info from {len(items)} project(s)")
     
-    if not text_blob or len(text_blob) < 50:
-        logger.warning(f"Text blob too short for extraction")
-        return None
+    results = [None] * len(items)
     
-    # Truncate if too long to avoid token limits
-    text_blob = text_blob[:4000]
+    # Skip blobs too short to be useful or already cached, remembering the
+    # original position of the rest
+    batch = []
+    cache_paths = {}
+    for idx, (project_url, text_blob) in enumerate(items):
+        if not text_blob or len(text_blob) < 50:
+            logger.warning(f"Text blob too short for extraction: {project_url}")
+            continue
+        # Truncate if too long to avoid token limits
+        token_encoding = get_token_encoding()
+        if token_encoding is None:
+            text_blob = text_blob[:MAX_PROJECT_TOKENS * CHARS_PER_TOKEN]
+        else:
+            token_ids = token_encoding.encode(text_blob, disallowed_special=())
+            if len(token_ids) > MAX_PROJECT_TOKENS:
+                text_blob = token_encoding.decode(token_ids[:MAX_PROJECT_TOKENS])
+        
+        cache_paths[idx] = llm_cache_path({"m": MODEL_NAME, "fields": EXTRACTION_FIELDS, "text": text_blob})
+        cached = read_cache_file(cache_paths[idx])
+        if isinstance(cached, dict):
+            logger.debug(f"LLM cache hit for project: {project_url}")
+            results[idx] = cached
+            continue
+        batch.append((idx, text_blob))
+    
+    if not batch:
+        return results
+    
+    projects_text = "\n\n".join(
+        f"=== PROJECT {i} ===\n{text_blob}" for i, (_, text_blob) in enumerate(batch)
+    )
     
-    message = client.chat.completions.create(
-        model=MODEL_NAME,
-        max_tokens=1024,
+    response_text = await chat(
+        max_tokens=min(MAX_OUTPUT_TOKENS, EXTRACTION_TOKENS_PER_PROJECT * len(batch)),
+        response_format={"type": "json_object"},
         messages=[
             {
                 "role": "user",
-                "content": f"""Extract structured information from this PhD project description.
+                "content": f"""Extract structured information from each of these {len(batch)} PhD project descriptions.
 
-Project text:
-{text_blob}
+{projects_text}
 
-Return ONLY a JSON object with these fields (use null for missing info):
-{{
-  "title": "Project title",
-  "university": "University name",
-  "supervisor": "Supervisor name(s)",
-  "funding": "Funding information or null if not mentioned",
-  "international_eligible": "true/false/null - is international funding available?",
-  "alignment_score": 0-10 (how aligned with AI/ML/data science based on the text),
-  "subject_area": "Main subject area (e.g., Machine Learning, NLP, CV)",
-  "key_skills": "Key skills mentioned or required"
-}}"""
+Return ONLY a JSON object of the form {{"projects": [...]}} containing one object per project, with these fields (use null for missing info):
+{EXTRACTION_FIELDS}"""
             }
         ]
     )
     
-    response_text = message.choices[0].message.content
     logger.debug(f"LLM response for extraction: {response_text[:200]}")
     
+    if not is_complete_json(response_text):
+        logger.error("LLM response for extraction is truncated, skipping batch")
+        return results
+    
     try:
-        project_info = json.loads(response_text)
-        return project_info
-    except json.JSONDecodeError as e:
+        projects = json_loads(response_text)["projects"]
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
         logger.error(f"Failed to parse LLM response as JSON: {e}")
-        return None
+        return results
+    
+    by_index = {}
+    duplicates = set()
+    for project_info in projects:
+        try:
+            batch_idx = int(project_info.pop("project_index"))
+        except (KeyError, TypeError, ValueError, AttributeError):
+            logger.warning("Dropping extracted project with missing/invalid project_index")
+            continue
+        if not 0 <= batch_idx < len(batch):
+            logger.warning(f"Dropping extracted project with out-of-range project_index {batch_idx}")
+            continue
+        if batch_idx in by_index:
+            duplicates.add(batch_idx)
+        by_index[batch_idx] = project_info
+    
+    # with a repeated index we can't tell which object belongs to the project
+    for batch_idx in duplicates:
+        logger.warning(f"Dropping extracted projects with duplicate project_index {batch_idx}")
+        del by_index[batch_idx]
+    
+    for batch_idx, project_info in by_index.items():
+        idx = batch[batch_idx][0]
+        write_cache_file(cache_paths[idx], project_info)
+        results[idx] = dict(project_info)
+    
+    return results
+
+# -------------------------
+# Helper: results already on disk
+# -------------------------
+def read_existing_results(csv_path=OUTPUT_CSV):
+    """
+    Return (header, urls) for a results CSV from a previous run, or
+    (None, empty set) if there isn't one yet.
+    """
+    if not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0:
+        return None, set()
+    
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        urls = {row["url"] for row in reader if row.get("url")}
+        return reader.fieldnames, urls
 
 # -------------------------
 # 5. Main agent workflow
 # -------------------------
-def main_agent(user_prompt, max_projects=None):
+async def main_agent(user_prompt, max_projects=None):
     """
     Main agent workflow that orchestrates the full pipeline.
     """
@@ -253,59 +580,178 @@ def main_agent(user_prompt, max_projects=None):
     
     # Step 1: LLM generates search queries
     try:
-        search_queries = generate_search_queries(user_prompt)
-    except json.JSONDecodeError as e:
+        search_queries = await generate_search_queries(user_prompt)
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
         logger.error(f"Failed to parse search queries from LLM: {e}")
         return
     
-    # Step 2-4: Process each search query
-    for query_idx, query_url in enumerate(search_queries, 1):
-        logger.info(f"\n[Query {query_idx}/{len(search_queries)}] Processing: {query_url}")
-        
-        # Step 2: Scraper gets project links
-        project_links = get_project_links(query_url)
-        
-        if not project_links:
-            logger.warning(f"No project links found for query {query_idx}")
-            continue
-        
-        # Process each project link
-        for link_idx, url in enumerate(project_links, 1):
-            if max_projects and len(all_projects) >= max_projects:
-                logger.info(f"Reached max_projects limit ({max_projects})")
-                break
+    # Load the tokenizer now, in a thread: on a cold machine tiktoken downloads
+    # its BPE file synchronously, which would otherwise stall the event loop
+    # mid-pipeline on the first extraction
+    await asyncio.to_thread(get_token_encoding)
+    
+    # Projects saved by earlier runs are skipped and new ones appended, keeping
+    # the existing file's column order so rows stay aligned
+    existing_header, seen_urls = read_existing_results()
+    if seen_urls:
+        logger.info(f"Skipping {len(seen_urls)} projects already in {OUTPUT_CSV}")
+    
+    # Steps 2-4 run as a pipeline so search pages, project pages and LLM calls
+    # overlap: producer -> url_queue -> fetch workers -> text_queue -> extractor
+    url_queue = asyncio.Queue(maxsize=URL_QUEUE_SIZE)
+    text_queue = asyncio.Queue()
+    llm_sem = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+    finished = asyncio.Event()
+    
+    # With max_projects, a worker claims a slot before fetching a page and only
+    # gives it back if that project fails, so we never scrape more than needed
+    budget = asyncio.Semaphore(max_projects) if max_projects else None
+    
+    def release_slot():
+        if budget:
+            budget.release()
+    
+    # Step 2: Scraper gets project links, one query after another
+    async def produce_links(session):
+        # the same project often shows up under several queries (or earlier runs)
+        queued = set(seen_urls)
+        for query_idx, query_url in enumerate(search_queries, 1):
+            logger.info(f"\n[Query {query_idx}/{len(search_queries)}] Processing: {query_url}")
             
-            logger.info(f"\n  [Project {link_idx}/{len(project_links)}] Processing: {url}")
+            project_links = await get_project_links(session, query_url)
+            if not project_links:
+                logger.warning(f"No project links found for query {query_idx}")
+                continue
             
-            # Step 3: Scraper gets clean text
-            text_blob = get_clean_text(url)
+            for url in project_links:
+                if url not in queued:
+                    queued.add(url)
+                    await url_queue.put(url)
+        
+        for _ in range(MAX_CONCURRENT_REQUESTS):
+            await url_queue.put(None)
+    
+    # Step 3: Scraper gets clean text
+    async def fetch_worker(session):
+        while (url := await url_queue.get()) is not None:
+            if budget:
+                await budget.acquire()
+            
+            logger.info(f"\n  [Project] Processing: {url}")
+            try:
+                text_blob = await get_clean_text(session, url)
+            except Exception as e:
+                # one bad page shouldn't take the whole worker down
+                logger.error(f"Unexpected error scraping {url}: {e}")
+                text_blob = ""
             
             if not text_blob:
                 logger.warning(f"Could not extract text from {url}")
+                release_slot()
                 continue
-            
-            # Step 4: LLM extracts structured info
-            project_info = extract_project_info(text_blob, url)
-            
+            await text_queue.put((url, text_blob))
+    
+    async def fetch_pages(session):
+        try:
+            await asyncio.gather(*(fetch_worker(session) for _ in range(MAX_CONCURRENT_REQUESTS)))
+        finally:
+            # always tell the extractor no more pages are coming
+            text_queue.put_nowait(None)
+    
+    # Step 4: LLM extracts structured info, EXTRACTION_BATCH_SIZE projects
+    # per call, with the calls running concurrently (bounded by llm_sem)
+    async def extract_batch(batch):
+        async with llm_sem:
+            try:
+                infos = await extract_project_info_batch(batch)
+            except Exception as e:
+                # treat an API failure like a bad response so its budget slots are freed
+                logger.error(f"LLM extraction failed for {len(batch)} project(s): {e}")
+                infos = [None] * len(batch)
+        
+        for (url, _), project_info in zip(batch, infos):
             if project_info:
                 project_info['url'] = url
                 all_projects.append(project_info)
+                writer.writerow(project_info)
+                csv_file.flush()
                 logger.info(f"  ✓ Successfully extracted: {project_info.get('title', 'Unknown')}")
             else:
                 logger.warning(f"Failed to extract info from {url}")
+                release_slot()
         
         if max_projects and len(all_projects) >= max_projects:
-            break
+            logger.info(f"Reached max_projects limit ({max_projects})")
+            finished.set()
+    
+    async def extract_projects():
+        tasks = set()
+        try:
+            more = True
+            while more and (item := await text_queue.get()) is not None:
+                # top the batch up with pages that arrive shortly after, but don't
+                # hold a partial batch back waiting for slow fetches. Polls with
+                # get_nowait rather than wait_for(get()), which can swallow a
+                # cancellation on Python 3.11 and leave this task stuck
+                batch = [item]
+                deadline = asyncio.get_running_loop().time() + BATCH_WAIT
+                while len(batch) < EXTRACTION_BATCH_SIZE:
+                    try:
+                        item = text_queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        if asyncio.get_running_loop().time() >= deadline:
+                            break
+                        await asyncio.sleep(BATCH_POLL_INTERVAL)
+                        continue
+                    if item is None:
+                        more = False
+                        break
+                    batch.append(item)
+                
+                task = asyncio.create_task(extract_batch(batch))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            
+            await asyncio.gather(*tasks)
+        finally:
+            # abort any streams still generating if the run stops early
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    # Step 5 happens inline: each project is written to the CSV as soon as it is
+    # extracted, so a crash mid-run keeps everything saved so far
+    with open(OUTPUT_CSV, 'a', newline='', encoding='utf-8') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=existing_header or CSV_FIELDS, extrasaction='ignore')
+        if not existing_header:
+            writer.writeheader()
+        
+        async with create_session() as session:
+            stages = [
+                asyncio.create_task(produce_links(session)),
+                asyncio.create_task(fetch_pages(session)),
+                asyncio.create_task(extract_projects()),
+            ]
+            limit_reached = asyncio.create_task(finished.wait())
+            pending = {*stages, limit_reached}
+            try:
+                # run until the extractor drains the pipeline or max_projects is hit;
+                # a failing stage re-raises here instead of stalling the others
+                while not finished.is_set() and not stages[-1].done():
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done - {limit_reached}:
+                        task.result()
+            finally:
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
     
-    # Step 5: Save results to CSV
     logger.info("\n" + "=" * 60)
     if all_projects:
-        df = pd.DataFrame(all_projects)
-        df.to_csv("phd_listings.csv", index=False)
-        logger.info(f"✓ Saved {len(all_projects)} projects to phd_listings.csv")
-        logger.info(f"Columns: {', '.join(df.columns)}")
+        logger.info(f"✓ Saved {len(all_projects)} new projects to {OUTPUT_CSV}")
+        logger.info(f"Columns: {', '.join(existing_header or CSV_FIELDS)}")
     else:
-        logger.warning("No projects were extracted")
+        logger.warning("No new projects were extracted")
     logger.info("=" * 60)
     
     return all_projects
@@ -317,7 +763,7 @@ if __name__ == "__main__":
     # Example usage
     user_input ='subject should be AI and machine learning or LLMs or multimodal ai or things related to artificial intelligence'
     
-    results = main_agent(user_input, max_projects=5)
+    results = asyncio.run(main_agent(user_input, max_projects=5))
     
     if results:
         print(f"\nExtracted {len(results)} projects:")